@@ -1,25 +1,103 @@
 import json
 import os
-import urllib.request
+import threading
+import http.client
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
 
-def handler(event, context):
-    
-    for record in event['Records']:
-        payload = json.loads(record['body'])
-        webhook_url = payload.get('callback_url')
-        
+# SQS delivers at most 10 results per invocation (see batch_size in main.tf)
+MAX_WORKERS = 10
+WEBHOOK_TIMEOUT = 5
+
+# Idle keep-alive connections per (scheme, host), kept at module scope so they
+# survive between warm invocations instead of paying TCP/TLS setup every time.
+_idle_connections = {}
+_pool_lock = threading.Lock()
+
+def _acquire_connection(scheme, netloc):
+    with _pool_lock:
+        idle = _idle_connections.get((scheme, netloc))
+        if idle:
+            return idle.pop(), True
+
+    conn_cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+    return conn_cls(netloc, timeout=WEBHOOK_TIMEOUT), False
+
+def _release_connection(scheme, netloc, conn):
+    with _pool_lock:
+        idle = _idle_connections.setdefault((scheme, netloc), [])
+        if len(idle) < MAX_WORKERS:
+            idle.append(conn)
+            return
+    conn.close()
+
+def post_json(url, payload):
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError(f"Unsupported callback URL: {url!r}")
+
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    body = json.dumps(payload).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+
+    while True:
+        conn, reused = _acquire_connection(parts.scheme, parts.netloc)
         try:
-            req = urllib.request.Request(
-                webhook_url,
-                data=json.dumps(payload).encode('utf-8'),
-                headers={'Content-Type': 'application/json'}
-            )
-
-            with urllib.request.urlopen(req, timeout=5) as response:
-                print(f"Webhook response status: {response.status}")
-                
-        except Exception as e:
-            print(f"Failed to send webhook: {e}")
-            raise e
-
-    return {"statusCode": 200, "body": "Callback executed successfully"}
\ No newline at end of file
+            conn.request('POST', path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            # The server dropped an idle keep-alive socket while we were frozen; retry on a fresh one
+            if reused:
+                continue
+            raise
+        except Exception:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            _release_connection(parts.scheme, parts.netloc, conn)
+        return response.status
+
+def send_webhook(record):
+    # Malformed bodies, missing URLs and unusable URLs fail the same way on every
+    # redelivery, so they are logged and acknowledged; only delivery errors retry.
+    try:
+        payload = json.loads(record['body'])
+        callback_url = payload.get('callback_url')
+    except (ValueError, AttributeError) as e:
+        print(f"Dropping malformed result {record['messageId']}: {e}")
+        return
+    if not callback_url:
+        return
+
+    try:
+        status = post_json(callback_url, payload)
+    except (ValueError, http.client.InvalidURL) as e:
+        print(f"Dropping result {record['messageId']}: {e}")
+        return
+    if status >= 400:
+        raise RuntimeError(f"Webhook returned HTTP {status}")
+
+def handler(event, context):
+    records = event['Records']
+
+    # Webhooks are pure network waits, so fire them concurrently:
+    # the batch takes as long as the slowest callback instead of the sum of all of them.
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(send_webhook, record) for record in records]
+
+    # Partial batch response: only failed webhooks are redelivered, so
+    # receivers that already got their result are not called again.
+    failures = []
+    for record, future in zip(records, futures):
+        if future.exception() is not None:
+            print(f"Failed to send webhook: {future.exception()}")
+            failures.append({"itemIdentifier": record['messageId']})
+
+    return {"batchItemFailures": failures}
@@ -22,13 +22,30 @@ resource "aws_dynamodb_table" "submissions" {
   }
 }
 
+# Records that keep failing are parked here instead of being redelivered forever
+resource "aws_sqs_queue" "submission_dlq" {
+  name = "codejudge-submission-dlq"
+}
+
+resource "aws_sqs_queue" "result_dlq" {
+  name = "codejudge-result-dlq"
+}
+
 resource "aws_sqs_queue" "submission_queue" {
   name = "codejudge-submission-queue"
   visibility_timeout_seconds = 30
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.submission_dlq.arn
+    maxReceiveCount     = 5
+  })
 }
 
 resource "aws_sqs_queue" "result_queue" {
   name = "codejudge-result-queue"
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.result_dlq.arn
+    maxReceiveCount     = 5
+  })
 }
 
 
@@ -88,6 +105,9 @@ resource "aws_lambda_event_source_mapping" "sqs_trigger" {
   event_source_arn = aws_sqs_queue.submission_queue.arn
   function_name    = aws_lambda_function.judge_engine.arn
   batch_size       = 1
+
+  # The worker returns batchItemFailures so only failed records are redelivered
+  function_response_types = ["ReportBatchItemFailures"]
 }
 
 resource "aws_iam_role_policy" "lambda_sqs_dynamo_policy" {
@@ -96,7 +116,7 @@ resource "aws_iam_role_policy" "lambda_sqs_dynamo_policy" {
     Version = "2012-10-17", Statement = [
       { Action = ["sqs:ReceiveMessage", "sqs:DeleteMessage", "sqs:GetQueueAttributes"], Effect = "Allow", Resource = aws_sqs_queue.submission_queue.arn },
       { Action = "sqs:SendMessage", Effect = "Allow", Resource = aws_sqs_queue.result_queue.arn },
-      { Action = ["dynamodb:UpdateItem", "dynamodb:PutItem", "dynamodb:GetItem"], Effect = "Allow", Resource = aws_dynamodb_table.submissions.arn }
+      { Action = ["dynamodb:UpdateItem", "dynamodb:PutItem", "dynamodb:GetItem", "dynamodb:BatchWriteItem"], Effect = "Allow", Resource = aws_dynamodb_table.submissions.arn }
     ]
   })
 }
@@ -242,4 +262,7 @@ resource "aws_lambda_event_source_mapping" "callback_sqs_trigger" {
   event_source_arn = aws_sqs_queue.result_queue.arn
   function_name    = aws_lambda_function.callback_engine.arn
   batch_size       = 10 # It can process up to 10 results in a single Lambda execution to save costs
+
+  # Only failed webhooks are redelivered, not the whole batch
+  function_response_types = ["ReportBatchItemFailures"]
 }
\ No newline at end of file
@@ -1,18 +1,60 @@
-import json
-import boto3
 import os
+import json
+import ctypes
+import orjson
+import hashlib
 import subprocess
-import uuid
+import signal
+import time
+import threading
+import select
+import codecs
+import tempfile
 import shutil
-import resource
-
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-dynamodb = boto3.resource('dynamodb')
-sqs = boto3.client('sqs')
 
 RESULT_QUEUE_URL = os.environ['RESULT_QUEUE_URL']
 TABLE_NAME = os.environ['TABLE_NAME']
-table = dynamodb.Table(TABLE_NAME)
+
+# boto3 is imported lazily and its clients cached for the container's lifetime,
+# so warm invocations reuse them without paying the import again.
+_ddb = None
+_sqs = None
+
+def _get_clients():
+    global _ddb, _sqs
+    if _ddb is None:
+        import boto3
+        _ddb = boto3.client('dynamodb')
+        _sqs = boto3.client('sqs')
+    return _ddb, _sqs
+
+# RAM-backed /dev/shm when the runtime provides one (Lambda does not, so this is usually /tmp)
+WORK_ROOT = "/dev/shm" if os.access("/dev/shm", os.W_OK) else "/tmp"
+# Records judged at once. Defaults to 1: concurrent runs share a uid (so they can tamper with each
+# other's workspaces and the caches), contend for CPU against wall-clock time limits, and share the
+# function's memory. Raising it trades those guarantees for throughput; threads suffice since each
+# run spends its time in the child, outside the GIL.
+MAX_PARALLEL_RECORDS = int(os.environ.get("MAX_PARALLEL_RECORDS", 1))
+
+def _restore_access_and_retry(func, path, exc):
+    # Submissions can chmod their own directories to 0; give the owner access back and retry
+    if func in (os.unlink, os.rmdir):
+        os.chmod(os.path.dirname(path), 0o700)
+        func(path)
+    elif os.path.isdir(path) and not os.path.islink(path):
+        os.chmod(path, 0o700)
+        shutil.rmtree(path, onexc=_restore_access_and_retry)
+    else:
+        raise exc
+
+def clean_work_dir(work_dir):
+    try:
+        shutil.rmtree(work_dir, onexc=_restore_access_and_retry)
+    except OSError as e:
+        print(f"Failed to remove workspace {work_dir}: {e}")
 
 def get_safe_env():
     return {
@@ -20,59 +62,277 @@ def get_safe_env():
         "LANG": "en_US.UTF-8"
     }
     
-def set_memory_limit(memory_limit_mb):
-    """Returns a preexec_fn that sets the virtual memory limit for the child process."""
-    def limit():
-        mem_bytes = memory_limit_mb * 1024 * 1024
-        resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
-    return limit
-
-def run_untrusted_code(cmd_list, work_dir, timeout=2,memory_limit_mb=256):
+# stdout is compared as it streams and only a preview is kept, stderr goes to a file capped
+# by RLIMIT_FSIZE, so a runaway print loop cannot balloon this process's memory.
+MAX_OUTPUT_BYTES = 1024 * 1024
+PIPE_READ_SIZE = 64 * 1024
+# Enough bytes to fill the 1000-character result preview even with multi-byte characters
+OUTPUT_PREVIEW_BYTES = 4096
+# Lambda offers neither user namespaces nor Landlock, so rlimits (applied by sandbox-exec) are the sandbox we can add
+# on top of the microVM. NPROC counts threads too, so it leaves room for the JVM's.
+MAX_PROCESSES = 64
+MAX_OPEN_FILES = 64
+
+# Built from sandbox_exec.c by the Dockerfile: sets the rlimits above, chdirs, then execs
+SANDBOX_EXEC = "/opt/bin/sandbox-exec"
+# Python ignores these; posix_spawn would pass that on, so restore the defaults in the child
+CHILD_DEFAULT_SIGNALS = (signal.SIGPIPE, signal.SIGXFSZ)
+
+def kill_process_group(pid):
     try:
-        process = subprocess.run(
-            cmd_list,
-            cwd=work_dir,
-            env=get_safe_env(), # STRIP AWS CREDENTIALS!
-            capture_output=True,
-            timeout=timeout,
-            preexec_fn=set_memory_limit(memory_limit_mb)
-        )
-        if process.returncode == 0:
-            return "AC", process.stdout.decode('utf-8')
-        else:
-            # returncode -9 (SIGKILL) or -11 (SIGSEGV) often signals MLE
-            if process.returncode in (-9, -11):
-                return "MLE", "Memory Limit Exceeded"
-            return "RE", process.stderr.decode('utf-8')
-    except subprocess.TimeoutExpired:
-        return "TLE", "Time Limit Exceeded"
-    except MemoryError:
-        return "MLE", "Memory Limit Exceeded"
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+# A program can leave its process group with setsid(), out of reach of kill_process_group.
+# As a child subreaper the worker inherits such orphans instead of init, so kill_orphans can find them.
+PR_SET_CHILD_SUBREAPER = 36
+ctypes.CDLL(None, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0)
+# Runs in flight; orphans are only swept when it drops to 0, so no live run's children are hit
+_active_runs = 0
+# Workspaces of finished runs, removed by the next sweep
+_pending_work_dirs = []
+_runs_lock = threading.Lock()
+
+def child_pids():
+    me = str(os.getpid())
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the ")" closing comm: state, ppid, ...
+        if stat[stat.rindex(")") + 2:].split()[1] == me:
+            pids.append(int(entry))
+    return pids
+
+def kill_orphans():
+    """Kills and reaps every child of the worker, including descendants that escaped their run's session."""
+    while True:
+        pids = child_pids()
+        if not pids:
+            return
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        for pid in pids:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+def spawn_sandboxed(cmd_list, work_dir, memory_limit_mb, stdout_fd, stderr_path):
+    """Starts cmd_list under sandbox-exec via a single posix_spawn call, in its own session."""
+    mem_bytes = memory_limit_mb * 1024 * 1024
+    argv = [SANDBOX_EXEC, work_dir, str(mem_bytes), str(MAX_OUTPUT_BYTES), str(MAX_PROCESSES), str(MAX_OPEN_FILES)] + cmd_list
+    return os.posix_spawn(
+        SANDBOX_EXEC, argv,
+        get_safe_env(), # STRIP AWS CREDENTIALS!
+        file_actions=[
+            (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+            (os.POSIX_SPAWN_DUP2, stdout_fd, 1),
+            (os.POSIX_SPAWN_OPEN, 2, stderr_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600),
+        ],
+        setsid=True,
+        setsigmask=(),
+        setsigdef=CHILD_DEFAULT_SIGNALS
+    )
+
+class OutputMatcher:
+    """Streaming form of `actual.strip() == expected.strip()`, fed the program's stdout chunk by chunk.
+
+    Compares decoded text rather than bytes so that strip() trims exactly what str.strip() does
+    (including \x1c-\x1f, \x85 and \xa0). Invalid UTF-8 decodes to lone surrogates, which never match.
+    """
+
+    def __init__(self, expected: str):
+        self.expected = expected.strip()
+        self.decoder = codecs.getincrementaldecoder('utf-8')('surrogateescape')
+        self.pos = 0
+        self.started = False
 
+    def feed(self, chunk: bytes) -> bool:
+        """Returns False as soon as the output can no longer match."""
+        return self._feed_text(self.decoder.decode(chunk))
 
-def execute_cpp(code, work_dir, timeout, memory_limit_mb):
+    def matched(self) -> bool:
+        # Flush the decoder: a truncated multi-byte sequence at the end is a mismatch
+        return self._feed_text(self.decoder.decode(b'', final=True)) and self.pos == len(self.expected)
+
+    def _feed_text(self, text: str) -> bool:
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return True
+            self.started = True
+        n = min(len(text), len(self.expected) - self.pos)
+        if text[:n] != self.expected[self.pos:self.pos + n]:
+            return False
+        self.pos += n
+        # Past the end of the expected output only trailing whitespace is allowed
+        return not text[n:].strip()
+
+def run_untrusted_code(cmd_list, work_dir, timeout=2,memory_limit_mb=256, expected_output=''):
+    """Runs the program and judges its stdout while it streams in.
+
+    The program is killed as soon as its output diverges from expected_output, so a wrong
+    answer costs as long as it takes to print the first wrong byte rather than the full run.
+    That makes WA take precedence over anything the program would have done afterwards: output
+    that diverges and is then followed by a crash, a timeout or running out of memory is judged
+    WA, not RE/TLE/MLE. Only the output limit ranks above it.
+    """
+    stderr_path = os.path.join(work_dir, "stderr")
+    matcher = OutputMatcher(expected_output)
+    preview = bytearray()
+    total = 0
+    exited = timed_out = mismatch = too_long = False
+
+    def consume(chunk):
+        nonlocal total, too_long, mismatch
+        if len(preview) < OUTPUT_PREVIEW_BYTES:
+            preview.extend(chunk[:OUTPUT_PREVIEW_BYTES - len(preview)])
+        total += len(chunk)
+        too_long = total > MAX_OUTPUT_BYTES
+        mismatch = not matcher.feed(chunk)
+        return too_long or mismatch
+
+    read_fd, write_fd = os.pipe()
+    try:
+        pid = spawn_sandboxed(cmd_list, work_dir, memory_limit_mb, write_fd, stderr_path)
+    finally:
+        os.close(write_fd)
+    pidfd = os.pidfd_open(pid)
+    try:
+        poller = select.poll()
+        poller.register(read_fd, select.POLLIN)
+        poller.register(pidfd, select.POLLIN)
+        deadline = time.monotonic() + timeout
+        stop = False
+        # Closing stdout is not the end of the run: only exit, the deadline or a verdict-deciding
+        # chunk ends the wait, so a program that closes fd 1 and keeps working is judged on its exit.
+        while not (exited or stop):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            for fd, _ in poller.poll(remaining * 1000):
+                if fd == pidfd:
+                    exited = True
+                    break
+                chunk = os.read(read_fd, PIPE_READ_SIZE)
+                if not chunk:
+                    poller.unregister(read_fd)
+                    continue
+                if consume(chunk):
+                    stop = True
+                    break
+
+        if exited and not stop:
+            # Kill leftover forks, then take only what is already buffered: a descendant that
+            # escaped the group and still holds the pipe open must not stretch the run to the deadline.
+            kill_process_group(pid)
+            os.set_blocking(read_fd, False)
+            while True:
+                try:
+                    chunk = os.read(read_fd, PIPE_READ_SIZE)
+                except BlockingIOError:
+                    break
+                if not chunk or consume(chunk):
+                    break
+    finally:
+        os.close(pidfd)
+        os.close(read_fd)
+        # Kill the whole group before reaping the leader; anything that left the group is handled by kill_orphans
+        kill_process_group(pid)
+        _, status = os.waitpid(pid, 0)
+    returncode = os.waitstatus_to_exitcode(status)
+
+    if timed_out:
+        return "TLE", b"Time Limit Exceeded"
+    if too_long:
+        return "RE", b"Output Limit Exceeded"
+    if mismatch:
+        return "WA", bytes(preview)
+    if returncode == 0:
+        return ("AC" if matcher.matched() else "WA"), bytes(preview)
+    # returncode -9 (SIGKILL) or -11 (SIGSEGV) often signals MLE
+    if returncode in (-9, -11):
+        return "MLE", b"Memory Limit Exceeded"
+    # SIGXFSZ: the program wrote past MAX_OUTPUT_BYTES
+    if returncode == -signal.SIGXFSZ:
+        return "RE", b"Output Limit Exceeded"
+    with open(stderr_path, "rb") as f:
+        return "RE", f.read(OUTPUT_PREVIEW_BYTES)
+
+
+# Built into the image by the Dockerfile: bits/stdc++.h plus its precompiled .gch
+PCH_DIR = "/opt/pch"
+# Compiled binaries keyed by source hash. Kept in this process's memory rather than /tmp,
+# which untrusted code can write to, so a submission cannot plant a binary for a later one.
+CPP_BINARY_CACHE_SIZE = 16
+_cpp_binary_cache = OrderedDict()
+# Records are judged on several threads; guards both in-memory caches
+_cache_lock = threading.Lock()
+
+def cache_get(cache, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+def cache_put(cache, key, value, max_size):
+    with _cache_lock:
+        cache[key] = value
+        if len(cache) > max_size:
+            cache.popitem(last=False)
+
+def compile_cpp(source_file, executable, work_dir):
+    # Flags must match the ones the PCH was built with, or g++ silently ignores it
+    cmd = ["g++", "-O2", "-pipe"]
+    if os.path.isdir(PCH_DIR):
+        cmd += ["-I", PCH_DIR]
+    subprocess.run(cmd + [source_file, "-o", executable], cwd=work_dir, check=True, capture_output=True, timeout=10)
+
+def execute_cpp(code, work_dir, timeout, memory_limit_mb, expected_output):
     source_file = os.path.join(work_dir, "solution.cpp")
     executable = os.path.join(work_dir, "a.out")
     
     with open(source_file, "w") as f:
         f.write(code)
+
+    code_hash = hashlib.sha256(code.encode('utf-8')).hexdigest()
+    binary = cache_get(_cpp_binary_cache, code_hash)
+    if binary is not None:
+        with open(executable, "wb") as f:
+            f.write(binary)
+        os.chmod(executable, 0o755)
+    else:
+        try:
+            compile_cpp(source_file, executable, work_dir)
+        except subprocess.CalledProcessError as e:
+            return "CE", e.stderr
+
+        with open(executable, "rb") as f:
+            cache_put(_cpp_binary_cache, code_hash, f.read(), CPP_BINARY_CACHE_SIZE)
         
-    try:
-        subprocess.run(["g++", "-O2", source_file, "-o", executable], cwd=work_dir, check=True, capture_output=True, timeout=10)
-    except subprocess.CalledProcessError as e:
-        return "CE", e.stderr.decode('utf-8')
-        
-    return run_untrusted_code([executable], work_dir, timeout, memory_limit_mb)
+    return run_untrusted_code([executable], work_dir, timeout, memory_limit_mb, expected_output)
 
-def execute_python(code, work_dir, timeout, memory_limit_mb):
+def execute_python(code, work_dir, timeout, memory_limit_mb, expected_output):
     source_file = os.path.join(work_dir, "solution.py")
     
     with open(source_file, "w") as f:
         f.write(code)
         
-    return run_untrusted_code(["python3", source_file], work_dir, timeout, memory_limit_mb)
+    return run_untrusted_code(["python3", source_file], work_dir, timeout, memory_limit_mb, expected_output)
 
-def execute_java(code, work_dir, timeout, memory_limit_mb):
+def execute_java(code, work_dir, timeout, memory_limit_mb, expected_output):
     source_file = os.path.join(work_dir, "Solution.java")
     
     with open(source_file, "w") as f:
@@ -81,15 +341,15 @@ def execute_java(code, work_dir, timeout, memory_limit_mb):
     try:
         subprocess.run(["javac", source_file], cwd=work_dir, check=True, capture_output=True, timeout=10)
     except subprocess.CalledProcessError as e:
-        return "CE", e.stderr.decode('utf-8')
+        return "CE", e.stderr
         
     jvm_heap = max(64, memory_limit_mb - 64)
     return run_untrusted_code(
         ["java", f"-Xmx{jvm_heap}m", "Solution"],
-        work_dir, timeout, memory_limit_mb
+        work_dir, timeout, memory_limit_mb, expected_output
     )
 
-def execute_javascript(code, work_dir, timeout, memory_limit_mb):
+def execute_javascript(code, work_dir, timeout, memory_limit_mb, expected_output):
     source_file = os.path.join(work_dir, "solution.js")
     
     with open(source_file, "w") as f:
@@ -98,10 +358,10 @@ def execute_javascript(code, work_dir, timeout, memory_limit_mb):
     node_heap = max(64, memory_limit_mb - 64)
     return run_untrusted_code(
         ["node", f"--max-old-space-size={node_heap}", source_file],
-        work_dir, timeout, memory_limit_mb
+        work_dir, timeout, memory_limit_mb, expected_output
     )
 
-def execute_go(code, work_dir, timeout, memory_limit_mb):
+def execute_go(code, work_dir, timeout, memory_limit_mb, expected_output):
     source_file = os.path.join(work_dir, "main.go")
     executable = os.path.join(work_dir, "main")
     
@@ -109,77 +369,209 @@ def execute_go(code, work_dir, timeout, memory_limit_mb):
         f.write(code)
         
     try:
-        # Go requires temporary cache directories. Redirect them to /tmp
+        # Go requires temporary cache directories. Keep them in the workspace so they are wiped with it
         go_env = get_safe_env()
         go_env["GOCACHE"] = os.path.join(work_dir, ".cache")
         go_env["GOMODCACHE"] = os.path.join(work_dir, ".modcache")
         
         subprocess.run(["go", "build", "-o", executable, source_file], cwd=work_dir, env=go_env, check=True, capture_output=True, timeout=10)
     except subprocess.CalledProcessError as e:
-        return "CE", e.stderr.decode('utf-8')
+        return "CE", e.stderr
         
-    return run_untrusted_code([executable], work_dir, timeout, memory_limit_mb)
+    return run_untrusted_code([executable], work_dir, timeout, memory_limit_mb, expected_output)
 
 
-def compare_output(actual: str, expected: str) -> bool:
-    return actual.strip() == expected.strip()
+def decode_preview(output: bytes) -> str:
+    """Decodes only the head of the output; the rest would be truncated away anyway."""
+    return output[:OUTPUT_PREVIEW_BYTES].decode('utf-8', errors='replace')
 
 
-def handler(event, context):
-    """Main entrypoint triggered by SQS."""
-    for record in event['Records']:
-        payload = json.loads(record['body'])
+# API limits: SendMessageBatch takes 10 entries, BatchWriteItem 25 requests
+SQS_BATCH_SIZE = 10
+DDB_BATCH_SIZE = 25
+DDB_BATCH_RETRIES = 5
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def send_results(sqs, results):
+    """Publishes all verdicts to the result queue, one SendMessageBatch call per 10 results.
+
+    Returns the indexes (into results) of the messages SQS did not accept.
+    """
+    failed = set()
+    for start in range(0, len(results), SQS_BATCH_SIZE):
+        batch = results[start:start + SQS_BATCH_SIZE]
+        response = sqs.send_message_batch(
+            QueueUrl=RESULT_QUEUE_URL,
+            # json.dumps, not orjson: it escapes U+FFFE/U+FFFF, which SQS rejects when sent raw
+            Entries=[{'Id': str(start + i), 'MessageBody': json.dumps(r)} for i, r in enumerate(batch)]
+        )
+        failed.update(int(f['Id']) for f in response.get('Failed', []))
+    return failed
+
+def write_results(ddb, results):
+    """Stores all verdicts with BatchWriteItem (the worker is the only writer, so a put equals an update).
+
+    Returns the submissionIds that were still unprocessed after retrying.
+    """
+    failed = set()
+    # BatchWriteItem rejects duplicate keys in one call, e.g. a redelivered submission in the same batch
+    latest = list({r['submissionId']: r for r in results}.values())
+    for batch in chunks(latest, DDB_BATCH_SIZE):
+        # Low-level client with pre-typed AttributeValues: skips the resource layer's TypeSerializer
+        request_items = {TABLE_NAME: [
+            {'PutRequest': {'Item': {
+                'submissionId': {'S': r['submissionId']},
+                'status': {'S': r['verdict']},
+                'result': {'S': r['output']}
+            }}}
+            for r in batch
+        ]}
+        for attempt in range(DDB_BATCH_RETRIES):
+            request_items = ddb.batch_write_item(RequestItems=request_items).get('UnprocessedItems')
+            if not request_items:
+                break
+            # No point waiting after the last attempt; the leftovers are reported as failed
+            if attempt < DDB_BATCH_RETRIES - 1:
+                time.sleep(0.05 * 2 ** attempt)
+        else:
+            failed.update(w['PutRequest']['Item']['submissionId']['S'] for w in request_items[TABLE_NAME])
+    return failed
+
+# Verdicts that depend only on (language, code, expected output, limits). TLE/MLE/RE can be
+# caused by a noisy neighbour or a transient failure, and so can CE (cc1plus or javac getting
+# OOM-killed looks like a compile error), so those are always re-judged.
+CACHEABLE_VERDICTS = ("AC", "WA")
+VERDICT_CACHE_SIZE = 1024
+# Kept in this process's memory rather than /tmp, for the same reason as _cpp_binary_cache
+_verdict_cache = OrderedDict()
+
+def verdict_cache_key(lang, code, expected_output, timeout, memory_limit_mb):
+    h = hashlib.sha256()
+    for part in (lang, str(timeout), str(memory_limit_mb), code, expected_output):
+        # surrogatepass: a lone surrogate in the code must not crash the batch before judge() turns it into RE
+        h.update(str(part).encode('utf-8', 'surrogatepass'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+def judge(lang, code, expected_output, timeout, memory_limit_mb):
+    global _active_runs
+    with _runs_lock:
+        _active_runs += 1
+    work_dir = None
+    try:
+        # Fresh workspace per record: a leftover that could not be removed never blocks the next one
+        work_dir = tempfile.mkdtemp(prefix="work-", dir=WORK_ROOT)
+
+        if lang == 'cpp': verdict, output = execute_cpp(code, work_dir,timeout, memory_limit_mb, expected_output)
+        elif lang == 'python': verdict, output = execute_python(code, work_dir,timeout, memory_limit_mb, expected_output)
+        elif lang == 'java': verdict, output = execute_java(code, work_dir,timeout, memory_limit_mb, expected_output)
+        elif lang == 'javascript': verdict, output = execute_javascript(code, work_dir,timeout, memory_limit_mb, expected_output)
+        elif lang == 'go': verdict, output = execute_go(code, work_dir,timeout, memory_limit_mb, expected_output)
+        else: verdict, output = "RE", f"Unsupported language: {lang}".encode('utf-8')
+        
+        output = decode_preview(output)
+    except Exception as e:
+        verdict, output = "RE", str(e)
+    finally:
+        # Check, sweep, clean and decrement under one lock so two finishing runs cannot each skip
+        # the sweep, and a sweep never reaps a run that is still cleaning up.
+        with _runs_lock:
+            if work_dir is not None:
+                _pending_work_dirs.append(work_dir)
+            if _active_runs == 1:
+                # Nothing the submission started may survive into the next record or warm invocation
+                kill_orphans()
+                # Prevent workspace persistence across Lambda warm starts. Only removed after the
+                # sweep, so an escaped descendant cannot keep refilling a directory being deleted.
+                for d in _pending_work_dirs:
+                    clean_work_dir(d)
+                _pending_work_dirs.clear()
+            _active_runs -= 1
+
+    return verdict, output
+
+def parse_body(body):
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        # orjson is stricter than json (e.g. it rejects lone surrogate escapes); accept what json always did
+        return json.loads(body)
+
+def process_record(record):
+    """Judges one SQS record. Returns its result payload, or None if the record is malformed and should be dropped.
+
+    Only records without a usable submissionId are dropped; any other invalid submission gets an RE result
+    so its sender is not left waiting for a verdict that never comes.
+    """
+    try:
+        payload = parse_body(record['body'])
         sub_id = payload.get('submissionId')
+        if not isinstance(sub_id, str) or not sub_id:
+            raise ValueError("missing submissionId")
+    except Exception as e:
+        # Redelivering cannot fix a malformed body, so log it and let the record be deleted
+        print(f"Dropping invalid submission {record['messageId']}: {e}")
+        return None
+
+    callback_url = payload.get('callback_url')
+    try:
         code = payload.get('sourceCode')
         lang = payload.get('language')
-        callback_url = payload.get('callback_url')
         expected_output = payload.get('expected_output', '')    
         timeout         = int(payload.get('timeout', 2))  
-        memory_limit_mb = int(payload.get('memoryLimit', 256)) 
-
-        
-        table.update_item(
-            Key={'submissionId': sub_id},
-            UpdateExpression='SET #st = :val',
-            ExpressionAttributeNames={'#st': 'status'},
-            ExpressionAttributeValues={':val': 'PROCESSING'}
-        )
-        
-        # Create unique ephemeral workspace
-        run_id = str(uuid.uuid4())
-        work_dir = os.path.join("/tmp", run_id)
-        os.makedirs(work_dir, exist_ok=True)
-        
-        try:
-            if lang == 'cpp': verdict, output = execute_cpp(code, work_dir,timeout, memory_limit_mb)
-            elif lang == 'python': verdict, output = execute_python(code, work_dir,timeout, memory_limit_mb)
-            elif lang == 'java': verdict, output = execute_java(code, work_dir,timeout, memory_limit_mb)
-            elif lang == 'javascript': verdict, output = execute_javascript(code, work_dir,timeout, memory_limit_mb)
-            elif lang == 'go': verdict, output = execute_go(code, work_dir,timeout, memory_limit_mb)
-            else: verdict, output = "RE", f"Unsupported language: {lang}"
-            
-            if verdict == "AC":
-                verdict = "AC" if compare_output(output, expected_output) else "WA"
-        except Exception as e:
-            verdict, output = "RE", str(e)
-        finally:
-            # Prevent workspace persistence across Lambda warm starts
-            shutil.rmtree(work_dir, ignore_errors=True)
-            
-        result_payload = {
-            "submissionId": sub_id, 
-            "verdict": verdict,
-            "output": output[:1000], # Truncate large outputs (for low memory ussage in sqs)
-            "callback_url" : callback_url
+        memory_limit_mb = int(payload.get('memoryLimit', 256))
+    except (TypeError, ValueError) as e:
+        return {
+            "submissionId": sub_id,
+            "verdict": "RE",
+            "output": f"Invalid submission: {e}"[:1000],
+            "callback_url": callback_url
         }
-        
-        sqs.send_message(QueueUrl=RESULT_QUEUE_URL, MessageBody=json.dumps(result_payload))
-        
-        table.update_item(
-            Key={'submissionId': sub_id},
-            UpdateExpression='SET #st = :v1, #op = :v2',
-            ExpressionAttributeNames={'#st': 'status', '#op': 'result'},
-            ExpressionAttributeValues={':v1': verdict, ':v2': result_payload["output"]}
-        )
-        
-    return {"statusCode": 200, "body": "Processed"}
\ No newline at end of file
+
+    # Resubmissions of identical code skip compile and run entirely
+    cache_key = verdict_cache_key(lang, code, expected_output, timeout, memory_limit_mb)
+    cached = cache_get(_verdict_cache, cache_key)
+    if cached is not None:
+        verdict, output = cached
+    else:
+        verdict, output = judge(lang, code, expected_output, timeout, memory_limit_mb)
+        output = output[:1000] # Truncate large outputs (for low memory ussage in sqs)
+        if verdict in CACHEABLE_VERDICTS:
+            cache_put(_verdict_cache, cache_key, (verdict, output), VERDICT_CACHE_SIZE)
+
+    return {
+        "submissionId": sub_id, 
+        "verdict": verdict,
+        "output": output,
+        "callback_url" : callback_url
+    }
+
+def handler(event, context):
+    """Main entrypoint triggered by SQS.
+
+    Records are judged in parallel, each in its own workspace. Uses SQS partial batch
+    responses: only the records listed in batchItemFailures are redelivered, so one
+    failure does not make Lambda re-judge the whole batch.
+    """
+    records = event['Records']
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_RECORDS) as executor:
+        outcomes = list(executor.map(process_record, records))
+
+    failed_message_ids = []
+    message_ids, results = [], []
+    for record, result in zip(records, outcomes):
+        if result is not None:
+            message_ids.append(record['messageId'])
+            results.append(result)
+
+    ddb, sqs = _get_clients()
+    unsent = send_results(sqs, results)
+    sent = [i for i in range(len(results)) if i not in unsent]
+    unstored = write_results(ddb, [results[i] for i in sent])
+
+    failed_message_ids += [message_ids[i] for i in sorted(unsent)]
+    failed_message_ids += [message_ids[i] for i in sent if results[i]['submissionId'] in unstored]
+    return {"batchItemFailures": [{"itemIdentifier": mid} for mid in failed_message_ids]}
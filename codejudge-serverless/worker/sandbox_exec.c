@@ -0,0 +1,74 @@
+/*
+ * sandbox-exec: applies the judge's resource limits, then execs the submission.
+ *
+ * os.posix_spawn cannot run a preexec_fn, change directory or close the
+ * worker's other descriptors, so the worker spawns this helper instead and it
+ * does all three before exec.
+ *
+ * usage: sandbox-exec <work_dir> <as_bytes> <fsize_bytes> <nproc> <nofile> <program> [args...]
+ */
+#include <errno.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/resource.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+
+/* Closes every descriptor above stderr; the submission must not inherit any of
+ * the worker's (e.g. the Lambda runtime's telemetry log fd). */
+static void close_inherited_fds(void)
+{
+#ifdef SYS_close_range
+    if (syscall(SYS_close_range, 3U, ~0U, 0U) == 0)
+        return;
+#endif
+    struct rlimit rl;
+    long max_fd = 1024;
+    if (getrlimit(RLIMIT_NOFILE, &rl) == 0 && rl.rlim_cur != RLIM_INFINITY)
+        max_fd = (long)rl.rlim_cur;
+    for (long fd = 3; fd < max_fd; fd++)
+        close((int)fd);
+}
+
+static int set_limit(int resource, const char *value)
+{
+    char *end;
+    errno = 0;
+    unsigned long long n = strtoull(value, &end, 10);
+    if (errno || *end || end == value) {
+        fprintf(stderr, "sandbox-exec: invalid limit '%s'\n", value);
+        return -1;
+    }
+    struct rlimit rl = { (rlim_t)n, (rlim_t)n };
+    if (setrlimit(resource, &rl) != 0) {
+        perror("sandbox-exec: setrlimit");
+        return -1;
+    }
+    return 0;
+}
+
+int main(int argc, char *argv[])
+{
+    if (argc < 7) {
+        fprintf(stderr, "usage: %s <work_dir> <as_bytes> <fsize_bytes> <nproc> <nofile> <program> [args...]\n", argv[0]);
+        return 127;
+    }
+    if (chdir(argv[1]) != 0) {
+        perror("sandbox-exec: chdir");
+        return 127;
+    }
+
+    /* Before RLIMIT_NOFILE is lowered, so the fallback loop still reaches every open fd */
+    close_inherited_fds();
+
+    struct rlimit no_core = { 0, 0 };
+    if (set_limit(RLIMIT_AS, argv[2]) || set_limit(RLIMIT_FSIZE, argv[3]) ||
+        set_limit(RLIMIT_NPROC, argv[4]) || set_limit(RLIMIT_NOFILE, argv[5]) ||
+        setrlimit(RLIMIT_CORE, &no_core) != 0)
+        return 127;
+
+    execvp(argv[6], &argv[6]);
+    fprintf(stderr, "sandbox-exec: %s: %s\n", argv[6], strerror(errno));
+    return 127;
+}